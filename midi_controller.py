@@ -1,7 +1,11 @@
 import mido
 import sys
+import functools
+import contextlib
+import threading
 import asyncio
 import websockets
+from websockets import broadcast
 import json
 from time import sleep
 import logging
@@ -17,17 +21,65 @@ import typer
 # Initialize Rich console and CLI app
 console = Console()
 app = typer.Typer()
+logger = logging.getLogger(__name__)
 
 # Constants
-DEVICE_SAVE_FILE = 'last_device.txt'
-CONTROL_SAVE_FILE = 'last_control.txt'
+CONFIG_FILE = 'config.json'
+LEGACY_DEVICE_FILE = 'last_device.txt'
+LEGACY_CONTROL_FILE = 'last_control.txt'
 VERSION = "1.0.0"
+LEARN_DURATION = 5.0  # seconds
+STATUS_REFRESH_INTERVAL = 0.1  # seconds
+MIDI_THREAD_PRIORITY = 10  # SCHED_FIFO priority for the MIDI input thread
+
+# Persisted settings (device name and control number)
+def load_legacy_config() -> dict:
+    """Load settings saved by older versions as one text file per value"""
+    data = {}
+    try:
+        if os.path.exists(LEGACY_DEVICE_FILE):
+            with open(LEGACY_DEVICE_FILE, 'r') as f:
+                data['device'] = f.read().strip()
+    except Exception as e:
+        console.print(f"[red]Could not load saved device: {e}[/]")
+    try:
+        if os.path.exists(LEGACY_CONTROL_FILE):
+            with open(LEGACY_CONTROL_FILE, 'r') as f:
+                data['control'] = int(f.read().strip())
+    except Exception as e:
+        console.print(f"[red]Could not load saved control: {e}[/]")
+    return data
+
+def load_config() -> dict:
+    """Load saved settings from the config file"""
+    if not os.path.exists(CONFIG_FILE):
+        return load_legacy_config()
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return data
+        console.print("[red]Could not load saved settings: expected a JSON object[/]")
+    except Exception as e:
+        console.print(f"[red]Could not load saved settings: {e}[/]")
+    return {}
 
 # Global state
-current_value = 0
-previous_value = 0
-clients = set()
-watching_control = None
+config = load_config()
+
+# Pre-encoded broadcast payloads for every possible crossfader percentage.
+# Each is a binary frame holding a single unsigned byte (0-100).
+_PAYLOADS = [bytes([v]) for v in range(101)]
+
+class State:
+    """Crossfader value, watched control and connected clients"""
+    __slots__ = ('current', 'previous', 'control', 'clients')
+    
+    def __init__(self):
+        self.current = 0
+        self.previous = 0
+        self.control = None
+        self.clients = set()
 
 def display_header():
     """Display application header"""
@@ -47,9 +99,14 @@ def display_devices_table(devices: list) -> None:
     
     console.print(table)
 
+@functools.lru_cache(maxsize=1)
+def list_input_devices() -> tuple:
+    """List MIDI input device names, probing the backend only once per run"""
+    return tuple(mido.get_input_names())
+
 def select_midi_device() -> Optional[str]:
     """Interactive MIDI device selection with rich UI"""
-    available_devices = mido.get_input_names()
+    available_devices = list_input_devices()
     
     if not available_devices:
         console.print("[red]No MIDI input devices found![/]")
@@ -70,7 +127,7 @@ def select_midi_device() -> Optional[str]:
     while True:
         try:
             selection = Prompt.ask(
-                "\nSelect device number",
+                "\nSelect device number ([bold]r[/] to refresh)",
                 show_default=False,
                 default="1"
             )
@@ -78,6 +135,16 @@ def select_midi_device() -> Optional[str]:
             if selection.lower() == 'q':
                 raise typer.Exit()
             
+            if selection.lower() == 'r':
+                list_input_devices.cache_clear()
+                available_devices = list_input_devices()
+                if not available_devices:
+                    console.print("[red]No MIDI input devices found![/]")
+                    return None
+                console.print("\n[bold]Available MIDI Input Devices:[/]")
+                display_devices_table(available_devices)
+                continue
+            
             device_idx = int(selection) - 1
             if 0 <= device_idx < len(available_devices):
                 selected_device = available_devices[device_idx]
@@ -88,116 +155,190 @@ def select_midi_device() -> Optional[str]:
         except ValueError:
             console.print("[red]Please enter a valid number.[/]")
 
-async def midi_monitor(device_name: str) -> None:
-    """Monitor MIDI input from specified device"""
-    global current_value, previous_value, watching_control
+def set_realtime_priority() -> None:
+    """Best-effort SCHED_FIFO scheduling for the calling thread"""
+    try:
+        # On Linux, pid 0 targets the calling thread rather than the process
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(MIDI_THREAD_PRIORITY))
+    except AttributeError:
+        logger.debug("SCHED_FIFO scheduling is not supported on this platform")
+    except OSError as e:
+        logger.debug("Could not raise MIDI thread priority: %s", e)
+
+@contextlib.asynccontextmanager
+async def open_midi_queue(device_name: str, control: Optional[int] = None):
+    """Open a MIDI input port whose messages are delivered on an asyncio.Queue
+    
+    If control is given, only the values of that control's CC messages are
+    queued; otherwise every message is queued as-is.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    elevated = False
+    
+    # RtMidi invokes the callback on its own native thread. Ask for realtime
+    # priority on that thread (best effort) and filter messages there so only
+    # relevant ones are handed over to the loop.
+    def callback(message):
+        nonlocal elevated
+        if not elevated:
+            elevated = True
+            set_realtime_priority()
+        if control is None:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+        elif message.type == 'control_change' and message.control == control:
+            loop.call_soon_threadsafe(queue.put_nowait, message.value)
+    
+    # Opening and closing the port can block, so keep both off the loop thread.
+    # A cancelled await doesn't stop the worker, so whichever side finishes
+    # last closes the port if this coroutine has given up on it.
+    lock = threading.Lock()
+    opened_port = None
+    abandoned = False
+    
+    def open_port():
+        nonlocal opened_port
+        port = mido.open_input(device_name, callback=callback)
+        with lock:
+            if abandoned:
+                port.close()
+            else:
+                opened_port = port
+        return port
+    
+    try:
+        inport = await loop.run_in_executor(None, open_port)
+    except asyncio.CancelledError:
+        with lock:
+            abandoned = True
+            if opened_port is not None:
+                opened_port.close()
+        raise
     
+    try:
+        yield queue
+    finally:
+        await loop.run_in_executor(None, inport.close)
+
+async def midi_monitor(state: State, device_name: str) -> None:
+    """Monitor MIDI input from specified device"""
     try:
         console.print(f"\n[green]Monitoring MIDI input from:[/] [blue]{device_name}[/]")
         
         # Learn control number if not set
-        if watching_control is None:
-            watching_control = await learn_control(device_name)
-            if watching_control is None:
+        if state.control is None:
+            state.control = await learn_control(device_name)
+            if state.control is None:
                 console.print("[red]Failed to learn control number. Exiting...[/]")
                 return
-            console.print(f"[green]Watching control number:[/] [blue]{watching_control}[/]")
+            console.print(f"[green]Watching control number:[/] [blue]{state.control}[/]")
         
         console.print("[dim]Watching crossfader values...[/]")
         
-        with mido.open_input(device_name) as inport:
+        loop = asyncio.get_running_loop()
+        
+        async with open_midi_queue(device_name, state.control) as queue:
             with console.status("") as status:
-                while True:
-                    for message in inport.iter_pending():
-                        if message.type == 'control_change' and message.control == watching_control:
-                            current_value = scale_value(message.value)
-                            if current_value != previous_value:
-                                status.update(f"Crossfader: [cyan]{current_value}%[/]")
-                                logging.info(f"Crossfader: {current_value}%")
-                                await broadcast_value()
-                                previous_value = current_value
-                    await asyncio.sleep(0.01)
+                # Repaint the status at most once per STATUS_REFRESH_INTERVAL
+                # so terminal output never runs on every MIDI event
+                refresh_handle = None
+                
+                def refresh_status():
+                    nonlocal refresh_handle
+                    refresh_handle = None
+                    status.update(f"Crossfader: [cyan]{state.current}%[/]")
+                
+                try:
+                    while True:
+                        # Drain everything queued since the last wakeup and keep
+                        # only the latest crossfader value, broadcasting it once
+                        latest = await queue.get()
+                        while not queue.empty():
+                            latest = queue.get_nowait()
+                        
+                        # Raw CC jitter often maps to the same percentage
+                        scaled = _SCALE[latest]
+                        if scaled == state.previous:
+                            continue
+                        state.previous = state.current = scaled
+                        
+                        broadcast_value(state)
+                        if logger.isEnabledFor(logging.INFO):
+                            logger.info("Crossfader: %d%%", scaled)
+                        if refresh_handle is None:
+                            refresh_handle = loop.call_later(STATUS_REFRESH_INTERVAL, refresh_status)
+                finally:
+                    # Don't repaint a status display that is about to stop
+                    if refresh_handle is not None:
+                        refresh_handle.cancel()
 
     except Exception as e:
         console.print(f"\n[red]An error occurred:[/] {str(e)}")
 
-async def websocket_handler(websocket):
+async def websocket_handler(state: State, websocket):
     """Handle websocket connections"""
     try:
         # Register client
-        clients.add(websocket)
+        state.clients.add(websocket)
         print("Client connected")
         
         # Send initial value
-        await websocket.send(json.dumps({"crossfader": current_value}))
+        await websocket.send(_PAYLOADS[state.current])
         
-        # Keep connection alive and handle incoming messages
-        while True:
-            try:
-                # Wait for a message with a timeout
-                await asyncio.wait_for(websocket.recv(), timeout=1.0)
-            except asyncio.TimeoutError:
-                try:
-                    # Send a ping to keep the connection alive
-                    pong_waiter = await websocket.ping()
-                    await asyncio.wait_for(pong_waiter, timeout=1.0)
-                except asyncio.TimeoutError:
-                    # No pong received, connection is dead
-                    raise websockets.exceptions.ConnectionClosed(
-                        1005, "Connection timed out"
-                    )
-            except websockets.exceptions.ConnectionClosed:
-                raise
+        # Drain incoming messages until the connection closes; keepalive
+        # pings are handled by the server (see ping_interval in run_server)
+        async for _ in websocket:
+            pass
             
-    except websockets.exceptions.ConnectionClosed as e:
-        print(f"Client disconnected with code {e.code}: {e.reason}")
+    except websockets.exceptions.ConnectionClosed:
+        pass
     except Exception as e:
         print(f"Unexpected websocket error: {str(e)}")
+        return
     finally:
-        clients.remove(websocket)
+        state.clients.discard(websocket)
+    
+    print(f"Client disconnected with code {websocket.close_code}: {websocket.close_reason}")
 
-async def broadcast_value():
+def broadcast_value(state: State):
     """Broadcast value to all connected clients"""
-    if not clients:  # Skip if no clients
-        return
-        
-    message = json.dumps({"crossfader": current_value})
-    disconnected_clients = set()
-    
-    for client in clients:
-        try:
-            await client.send(message)
-        except websockets.exceptions.ConnectionClosed:
-            disconnected_clients.add(client)
-        except Exception as e:
-            print(f"Error broadcasting to client: {str(e)}")
-            disconnected_clients.add(client)
-    
-    # Remove disconnected clients
-    clients.difference_update(disconnected_clients)
+    # Frames are encoded once and written to every open connection;
+    # closed connections are skipped and cleaned up by websocket_handler.
+    # broadcast() never yields to the loop, so clients cannot change size
+    # while it is being iterated and no snapshot copy is needed.
+    if state.clients:
+        broadcast(state.clients, _PAYLOADS[state.current])
 
 def scale_value(value, in_min=0, in_max=127, out_min=0, out_max=100):
     """Scale a value from one range to another"""
     return round((value - in_min) * (out_max - out_min) / (in_max - in_min) + out_min)
 
-# Add new functions for device handling
-def save_selected_device(device_name):
-    """Save the selected device name to a file"""
-    try:
-        with open(DEVICE_SAVE_FILE, 'w') as f:
-            f.write(device_name)
-    except Exception as e:
-        print(f"Could not save device selection: {e}")
+# Crossfader percentage for every 7-bit MIDI value
+_SCALE = tuple(scale_value(v) for v in range(128))
 
-def load_saved_device():
-    """Load the previously selected device name from file"""
+# Persisted settings (device name and control number)
+def save_config_value(key: str, value) -> None:
+    """Update a saved setting, rewriting the config file atomically if it changed"""
+    if config.get(key) == value:
+        return
     try:
-        if os.path.exists(DEVICE_SAVE_FILE):
-            with open(DEVICE_SAVE_FILE, 'r') as f:
-                return f.read().strip()
+        tmp_file = CONFIG_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({**config, key: value}, f, indent=2)
+        os.replace(tmp_file, CONFIG_FILE)
     except Exception as e:
-        print(f"Could not load saved device: {e}")
-    return None
+        console.print(f"[red]Could not save settings: {e}[/]")
+        return
+    config[key] = value
+
+def save_selected_device(device_name: str):
+    """Save the selected device name"""
+    save_config_value('device', device_name)
+
+def load_saved_device() -> Optional[str]:
+    """Load the previously selected device name"""
+    device_name = config.get('device')
+    return device_name if isinstance(device_name, str) else None
 
 async def learn_control(device_name: str) -> Optional[int]:
     """Interactive control number learning mode"""
@@ -216,40 +357,48 @@ async def learn_control(device_name: str) -> Optional[int]:
     console.print("[dim]3. Press Ctrl+C when you're done moving the crossfader[/]")
     
     try:
-        detected_controls = {}  # Store control numbers and their value ranges
+        # Value range and change count per control number (CC 0-127)
+        mins = [128] * 128
+        maxs = [-1] * 128
+        changes = [0] * 128
+        detected = 0
         
-        with mido.open_input(device_name) as inport:
+        loop = asyncio.get_running_loop()
+        
+        async with open_midi_queue(device_name) as queue:
             with console.status("[bold yellow]Monitoring crossfader movement...[/]") as status:
                 try:
                     # Monitor for 5 seconds or until Ctrl+C
-                    for _ in range(500):  # 5 seconds (0.01s * 500)
-                        for message in inport.iter_pending():
-                            if message.type == 'control_change':
-                                control = message.control
-                                value = message.value
-                                
-                                if control not in detected_controls:
-                                    detected_controls[control] = {
-                                        'min': value,
-                                        'max': value,
-                                        'changes': 1
-                                    }
-                                else:
-                                    detected_controls[control]['min'] = min(detected_controls[control]['min'], value)
-                                    detected_controls[control]['max'] = max(detected_controls[control]['max'], value)
-                                    detected_controls[control]['changes'] += 1
-                                
-                                status.update(f"Monitoring... Found {len(detected_controls)} controls")
+                    deadline = loop.time() + LEARN_DURATION
+                    while True:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            break
+                        try:
+                            message = await asyncio.wait_for(queue.get(), timeout=remaining)
+                        except asyncio.TimeoutError:
+                            break
                         
-                        await asyncio.sleep(0.01)
+                        if message.type == 'control_change':
+                            control = message.control
+                            value = message.value
+                            
+                            if value < mins[control]:
+                                mins[control] = value
+                            if value > maxs[control]:
+                                maxs[control] = value
+                            if not changes[control]:
+                                detected += 1
+                                status.update(f"Monitoring... Found {detected} controls")
+                            changes[control] += 1
                 except KeyboardInterrupt:
                     pass  # Allow early exit with Ctrl+C
         
         # Filter controls with significant movement
-        significant_controls = {
-            ctrl: data for ctrl, data in detected_controls.items()
-            if (data['max'] - data['min'] > 20 and data['changes'] > 5)
-        }
+        significant_controls = [
+            ctrl for ctrl in range(128)
+            if maxs[ctrl] - mins[ctrl] > 20 and changes[ctrl] > 5
+        ]
         
         if not significant_controls:
             console.print("[red]No significant control movements detected. Please try again.[/]")
@@ -261,11 +410,11 @@ async def learn_control(device_name: str) -> Optional[int]:
         table.add_column("Range", style="green")
         table.add_column("# Changes", style="yellow")
         
-        for ctrl, data in significant_controls.items():
+        for ctrl in significant_controls:
             table.add_row(
                 str(ctrl),
-                f"{data['min']} - {data['max']}",
-                str(data['changes'])
+                f"{mins[ctrl]} - {maxs[ctrl]}",
+                str(changes[ctrl])
             )
         
         console.print("\n[bold]Detected Controls with Significant Movement:[/]")
@@ -275,7 +424,7 @@ async def learn_control(device_name: str) -> Optional[int]:
         while True:
             selection = Prompt.ask(
                 "\nEnter the control number for your crossfader",
-                choices=[str(ctrl) for ctrl in significant_controls.keys()],
+                choices=[str(ctrl) for ctrl in significant_controls],
                 show_choices=False
             )
             
@@ -290,24 +439,15 @@ async def learn_control(device_name: str) -> Optional[int]:
         console.print(f"[red]Error in learn mode:[/] {str(e)}")
         return None
 
-# Add new function to save control number
 def save_control_number(control: int):
-    """Save the selected control number to a file"""
-    try:
-        with open(CONTROL_SAVE_FILE, 'w') as f:
-            f.write(str(control))
-    except Exception as e:
-        console.print(f"[red]Could not save control selection: {e}[/]")
+    """Save the selected control number"""
+    save_config_value('control', control)
 
-# Add new function to load control number
 def load_control_number() -> Optional[int]:
-    """Load the previously selected control number from file"""
-    try:
-        if os.path.exists(CONTROL_SAVE_FILE):
-            with open(CONTROL_SAVE_FILE, 'r') as f:
-                return int(f.read().strip())
-    except Exception as e:
-        console.print(f"[red]Could not load saved control: {e}[/]")
+    """Load the previously selected control number"""
+    control = config.get('control')
+    if isinstance(control, int) and not isinstance(control, bool) and 0 <= control <= 127:
+        return control
     return None
 
 @app.command()
@@ -318,9 +458,14 @@ def main(device: str = typer.Argument(None, help="MIDI device name")):
     try:
         display_header()
         
+        state = State()
+        
         async def run_server():
             # Start websocket server
-            server = await websockets.serve(websocket_handler, "localhost", 8765)
+            server = await websockets.serve(
+                functools.partial(websocket_handler, state), "localhost", 8765,
+                ping_interval=20, ping_timeout=20
+            )
             console.print(
                 "[green]WebSocket server started at[/] [blue]ws://localhost:8765[/]"
             )
@@ -334,10 +479,24 @@ def main(device: str = typer.Argument(None, help="MIDI device name")):
             # Run both tasks concurrently
             await asyncio.gather(
                 server.serve_forever(),
-                midi_monitor(device_name)
+                midi_monitor(state, device_name)
             )
         
-        asyncio.run(run_server())
+        # Use the libuv-based event loop when it is installed
+        loop_factory = None
+        try:
+            import uvloop
+            if sys.version_info >= (3, 12):
+                loop_factory = uvloop.new_event_loop
+            else:
+                uvloop.install()
+        except ImportError:
+            pass
+        
+        if loop_factory is not None:
+            asyncio.run(run_server(), loop_factory=loop_factory)
+        else:
+            asyncio.run(run_server())
         
     except KeyboardInterrupt:
         console.print("\n[yellow]Shutting down...[/]")